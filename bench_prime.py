@@ -6,11 +6,11 @@ Credits: Galeno Garbe
 
 This program searches for a prime number with a specified digit count.
 It uses gmpy2 for fast arbitrary-precision arithmetic and multiprocessing to 
-distribute the work across physical CPU cores. Performance data is logged to a JSON file 
+distribute the work across physical CPU cores. Performance data is logged to a JSON Lines file 
 and compared against historical best results.
 
-An animated spinner (using the Rich library) is displayed below the progress 
-information during processing.
+Progress information is shown on a single line that is redrawn in place
+during processing.
 """
 
 import sys
@@ -21,58 +21,152 @@ import time
 import psutil
 import os
 import math
-import random
+import bisect
+import functools
+import threading
+import statistics
+from collections import deque
 import json
 import multiprocessing
 import argparse
 import platform
 import gmpy2
 from gmpy2 import mpz
-from colorama import init, Fore, Style
+import shutil
 import subprocess   # to ensure the beep command is fully executed
 import signal       # (not used for interactive prompt in this version)
 
-from rich.live import Live
-from rich.text import Text
-from rich.console import Console
+# colorama is optional (e.g. when running under PyPy without it): without it the
+# output is uncolored.
+try:
+    from colorama import init, Fore, Style
+    init(autoreset=True)
+except ImportError:
+    class Fore:
+        GREEN = ""
+        RED = ""
 
-# Initialize colorama and create a Rich console
-init(autoreset=True)
-console = Console()
+    class Style:
+        RESET_ALL = ""
+
+# numpy is optional: it vectorizes the per-segment update of the sieving offsets
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# numba is optional: it compiles the sieve marking loop (requires numpy)
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 # Constant: natural logarithm of 10
 LOG10 = math.log(10)
 
+# Mod-30 wheel: residues coprime to 2, 3 and 5, and the same as a 30-byte mask
+WHEEL_OFFSETS = (1, 7, 11, 13, 17, 19, 23, 29)
+WHEEL_MASK = bytes(1 if i in WHEEL_OFFSETS else 0 for i in range(30))
+
+# Largest prime used to sieve candidates before the probable-prime test
+SIEVE_LIMIT = 100_000
+
+# Search bounds (lower, upper) as mpz; set by main() before the workers are forked,
+# so every worker inherits them instead of receiving and converting them again
+_BOUNDS = None
+
+# Progress display refresh interval and CPU usage sampling window (seconds)
+PROGRESS_INTERVAL = 0.25
+CPU_SAMPLE_INTERVAL = 0.5
+# Number of recent CPU usage samples averaged for the display and the log
+CPU_SAMPLE_COUNT = 60
+
+def physical_core_cpus():
+    """
+    Returns one logical CPU per physical core among the CPUs this process may run on,
+    read from the sysfs topology (core_cpus_list, or thread_siblings_list on older
+    kernels), so workers pinned to them never share a core with an SMT sibling.
+    Returns None where the topology or CPU affinity is not available (e.g. macOS).
+    """
+    try:
+        allowed = psutil.Process().cpu_affinity()
+    except (AttributeError, psutil.Error, OSError):
+        return None
+    cores = {}
+    for cpu in allowed:
+        topology = f"/sys/devices/system/cpu/cpu{cpu}/topology/"
+        for name in ("core_cpus_list", "thread_siblings_list"):
+            try:
+                with open(topology + name, "r") as f:
+                    siblings = f.read().strip()
+                break
+            except OSError:
+                pass
+        else:
+            return None
+        cores.setdefault(siblings, cpu)
+    return sorted(cores.values()) or None
+
+# CPU topology, read once (psutil walks /sys on Linux) and reused by every run of a --repeat series
+_NUM_CPUS = psutil.cpu_count(logical=True) or os.cpu_count() or 1
+_PHYSICAL_CORES = psutil.cpu_count(logical=False) or _NUM_CPUS
+# One allowed logical CPU per physical core, for the default worker count and pinning
+_CORE_CPUS = physical_core_cpus()
+
+# Spacing of the per-worker counter slots, in 8-byte entries: one 64-byte cache line per
+# worker, so flushes from different workers never contend for the same line (false sharing)
+COUNTER_STRIDE = 8
+
+# Number of candidates a worker counts locally before flushing them to its shared counter slot,
+# at 10 digits; scaled down in proportion to the digit count, since each test gets slower
+ATTEMPT_FLUSH_INTERVAL = 1024
+
 # ---------------- Função para tocar som ----------------
+# Comando de beep do Linux, procurado uma única vez na importação (None se não houver)
+_BEEP_CMD = shutil.which("beep") if sys.platform.startswith("linux") else None
+
 def play_beep():
     """
     Toca um beep usando o comando adequado conforme o sistema operacional.
-    No macOS utiliza AppleScript; no Linux tenta usar o comando "beep" se estiver disponível,
+    No macOS utiliza AppleScript; no Linux usa o comando "beep" se estiver disponível,
     caso contrário, imprime o caractere BEL.
     """
     if sys.platform == "darwin":
-        os.system('osascript -e "beep"')
-        
-    elif sys.platform.startswith("linux"):
-        # Tenta usar o comando 'beep' se estiver instalado; caso contrário, imprime o caractere BEL.
-        if os.system("command -v beep > /dev/null 2>&1") == 0:
-            os.system("beep")
-        else:
-            print('\a')
+        subprocess.run(["osascript", "-e", "beep"], check=False)
+    elif _BEEP_CMD:
+        subprocess.run([_BEEP_CMD], check=False)
     else:
         print('\a')
 # ---------------------------------------------------------
 
 # ---------------- Utility Functions ----------------
+@functools.lru_cache(maxsize=64)
+def pow10(k):
+    """
+    Returns 10**k as an mpz (one GMP power), memoized so the runs of a --repeat series
+    do not recompute their search bounds.
+    """
+    return mpz(10) ** k
+
 def format_scientific(n, precision=3):
     """
     Formats a large integer in scientific notation without converting it to float.
     For example, a 1000-digit number with precision=3 returns "1.23e+999".
+    'n' may also be given as a decimal string. Integers are converted with
+    gmpy2.digits, whose subquadratic conversion is much faster than str() for
+    numbers with thousands of digits.
     """
     try:
-        s = str(n)
+        s = n if isinstance(n, str) else gmpy2.digits(mpz(n), 10)
     except Exception as e:
         raise ValueError(f"Error converting integer to string: {e}")
+    return format_scientific_from_str(s, precision)
+
+def format_scientific_from_str(s, precision=3):
+    """
+    Same as format_scientific for a number already converted to a decimal string:
+    only slices the string, so an existing conversion can be shared.
+    """
     if len(s) <= precision:
         return s
     exponent = len(s) - 1
@@ -108,17 +202,138 @@ def format_final_time(seconds):
         centiseconds = int((seconds - int(seconds)) * 100)
         return f"{minutes:02d}:{secs:02d}:{centiseconds:02d}"
 
-def is_probable_prime(n, k=10):
+def primes_up_to(n):
     """
-    Tests if 'n' is prime using gmpy2.
-    Converts n to mpz and uses gmpy2.is_prime.
-    Returns True if the number is (probably) prime.
+    Returns the list of primes <= n (sieve of Eratosthenes).
     """
-    try:
-        n = mpz(n)
-        return gmpy2.is_prime(n) > 0
-    except Exception as e:
-        raise ValueError(f"Error in is_probable_prime: {e}")
+    sieve = bytearray([1]) * (n + 1)
+    sieve[:2] = b"\x00\x00"
+    for i in range(2, math.isqrt(n) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, n + 1, i)))
+    return [i for i, is_p in enumerate(sieve) if is_p]
+
+# Pre-sieve: the mod-30 wheel extended with 7, 11 and 13 is periodic with period 30030,
+# so segments are cut from this precomputed pattern instead of sieving those primes
+PRESIEVE_PRIMES = (7, 11, 13)
+PRESIEVE_PERIOD = 30 * 7 * 11 * 13
+PRESIEVE_MASK = bytes(1 if math.gcd(i, PRESIEVE_PERIOD) == 1 else 0 for i in range(PRESIEVE_PERIOD))
+# Two periods, so any segment up to one period long is a single copy of a slice
+_PRESIEVE_VIEW = memoryview(PRESIEVE_MASK * 2)
+
+# Sieving primes: everything above the pre-sieve primes up to SIEVE_LIMIT
+SIEVE_PRIMES = tuple(primes_up_to(SIEVE_LIMIT)[6:])
+SIEVE_PRIMES_ARRAY = np.array(SIEVE_PRIMES, dtype=np.int64) if np is not None else None
+
+def sieve_parameters(digits):
+    """
+    Returns (segment_length, primes) for sieving numbers with the given digit count.
+    A segment spans about twice the average prime gap (2 * ln(10**digits)), so one
+    segment usually contains a prime. Only primes up to 100 * digits (between 1000
+    and SIEVE_LIMIT) are used: sieving deeper stops paying off once removing a
+    candidate costs more than the probable-prime test it saves.
+    """
+    segment_length = 30 * max(8, math.ceil(2 * digits * LOG10 / 30))
+    limit = min(SIEVE_LIMIT, max(1000, 100 * digits))
+    return segment_length, SIEVE_PRIMES[:bisect.bisect_right(SIEVE_PRIMES, limit)]
+
+def first_multiple_offsets(base, primes):
+    """
+    Returns, for each prime, the offset from 'base' of its first multiple >= base
+    (a numpy array if numpy is available, else a list).
+    This is the only place where the (bignum) base is divided by the small primes.
+    """
+    offsets = [-int(base % p) % p for p in primes]
+    return np.array(offsets, dtype=np.int64) if np is not None else offsets
+
+def advance_offsets(offsets, primes, length):
+    """
+    Returns the first-multiple offsets for base + length from those for base,
+    using small-int arithmetic only (no bignum division). With numpy this is a
+    single vectorized operation ('primes' is always a prefix of SIEVE_PRIMES).
+    """
+    if np is not None:
+        return (offsets - length) % SIEVE_PRIMES_ARRAY[:len(primes)]
+    return [(r - length) % p for p, r in zip(primes, offsets)]
+
+def _presieved_segment(base, length):
+    """
+    Returns base .. base + length - 1 as a bytearray cut from the pre-sieved pattern,
+    rotated to base (one small bignum remainder), with PRESIEVE_PRIMES themselves kept.
+    """
+    shift = int(base % PRESIEVE_PERIOD)
+    if shift + length <= len(_PRESIEVE_VIEW):
+        segment = bytearray(_PRESIEVE_VIEW[shift:shift + length])
+    else:
+        repeats = (shift + length - 1) // PRESIEVE_PERIOD + 1
+        segment = bytearray((PRESIEVE_MASK * repeats)[shift:shift + length])
+    for p in PRESIEVE_PRIMES:
+        if base <= p < base + length:
+            segment[p - base] = 1
+    return segment
+
+def sieve_segment(base, length, primes, offsets):
+    """
+    Sieves the numbers base .. base + length - 1 ('base' and 'length' multiples of 30),
+    given the first-multiple offsets of 'primes' for 'base'.
+    Returns a bytearray where entry i is 1 if base + i is coprime to 30030 and has no
+    factor in 'primes' (a prime from 'primes' or PRESIEVE_PRIMES itself is kept).
+    Each prime costs one C-level slice assignment, instead of one trial division per
+    candidate (the numba kernel is used by sieve_next_segment instead).
+    """
+    segment = _presieved_segment(base, length)
+    if np is not None:
+        # Plain ints: slicing with numpy scalars is much slower
+        offsets = offsets.tolist()
+    # Near the bottom of the number line, start crossing out at p*p so p itself survives
+    small_base = bool(primes) and base < primes[-1] ** 2
+    for p, r in zip(primes, offsets):
+        if small_base and base + r < p * p:
+            r = int(p * p - base)
+        if r < length:
+            segment[r::p] = bytes((length - 1 - r) // p + 1)
+    return segment
+
+def sieve_next_segment(base, length, primes, offsets):
+    """
+    Same as sieve_segment, but also returns the first-multiple offsets for
+    base + length, as (segment, offsets). With numba the marking loop advances the
+    offsets itself, updating 'offsets' in place, so there is no separate pass.
+    """
+    if _mark_segment is not None and primes and base >= primes[-1] ** 2:
+        segment = _presieved_segment(base, length)
+        _mark_segment(np.frombuffer(segment, dtype=np.uint8),
+                      SIEVE_PRIMES_ARRAY[:len(primes)], offsets, length)
+        return segment, offsets
+    return (sieve_segment(base, length, primes, offsets),
+            advance_offsets(offsets, primes, length))
+
+if njit is not None and np is not None:
+    @njit(cache=True)
+    def _mark_segment(segment, primes, offsets, length):
+        """
+        Compiled marking loop: crosses out the multiples of each prime in 'segment' and
+        leaves in 'offsets' (in place) the first-multiple offsets for the next segment.
+        """
+        for k in range(primes.shape[0]):
+            p = primes[k]
+            j = offsets[k]
+            while j < length:
+                segment[j] = 0
+                j += p
+            offsets[k] = j - length
+else:
+    _mark_segment = None
+
+def warm_up_sieve():
+    """
+    Compiles (or loads from numba's cache) the marking kernel in the calling process.
+    Called by main() before forking, so the workers inherit the compiled code instead of
+    each loading it again (~150 ms per worker) on every run of a --repeat series.
+    """
+    if _mark_segment is not None:
+        _mark_segment(np.zeros(30, dtype=np.uint8), SIEVE_PRIMES_ARRAY[:1],
+                      np.zeros(1, dtype=np.int64), 30)
 
 def compute_variation(actual, best, lower_is_better=True):
     """
@@ -135,132 +350,429 @@ def compute_variation(actual, best, lower_is_better=True):
     except Exception as e:
         raise ValueError(f"Error computing variation: {e}")
 
+# Variation colors indexed by sign + 1: negative (red), zero (uncolored), positive (green)
+_COLORS = (Fore.RED, "", Fore.GREEN)
+
 def format_variation(value):
     """
-    Formats the variation value with two decimal places and colors it.
+    Formats the variation value with two decimal places and colors it
+    (color picked from _COLORS by the sign of the value, without branching).
     """
     try:
         formatted = f"{value:.2f}"
     except Exception as e:
         formatted = "0.00"
-    if value > 0:
-        return f"{Fore.GREEN}{formatted}{Style.RESET_ALL}"
-    elif value < 0:
-        return f"{Fore.RED}{formatted}{Style.RESET_ALL}"
-    else:
-        return formatted
+    sign = (value > 0) - (value < 0)
+    return f"{_COLORS[sign + 1]}{formatted}{Style.RESET_ALL if sign else ''}"
 # ---------------------------------------------------------
 
 # ---------------- Log Handling Functions ----------------
-def update_log(entry, log_file="prime_log.json"):
+def _load_logs(log_file="prime_log.jsonl"):
     """
-    Updates the JSON log file with the new entry.
+    Returns the list of log entries from the JSON Lines log (only read to rebuild the
+    index). Returns an empty list if the file does not exist; lines that cannot be
+    parsed (e.g. a partially written last line) are skipped.
     """
+    if not os.path.exists(log_file):
+        return []
     logs = []
     try:
-        if os.path.exists(log_file):
-            with open(log_file, "r", encoding="utf-8") as f:
-                logs = json.load(f)
-    except (json.JSONDecodeError, IOError):
-        logs = []
+        with open(log_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    logs.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
     except Exception as e:
         print(f"Error reading log file: {e}")
-        logs = []
+        return []
+    return logs
+
+def _migrate_json_to_jsonl(json_file="prime_log.json", jsonl_file="prime_log.jsonl"):
+    """
+    One-time migration of the old JSON array log to the JSON Lines format.
+    Does nothing if the JSON Lines log already exists or there is no old log.
+    The old file is left in place.
+    """
+    if os.path.exists(jsonl_file) or not os.path.exists(json_file):
+        return
     try:
-        logs.append(entry)
-        with open(log_file, "w", encoding="utf-8") as f:
-            json.dump(logs, f, indent=2)
+        with open(json_file, "r", encoding="utf-8") as f:
+            logs = json.load(f)
+        with open(jsonl_file, "w", encoding="utf-8") as f:
+            for entry in logs:
+                f.write(json.dumps(entry) + "\n")
+        print(f"Migrated {len(logs)} log entries from {json_file} to {jsonl_file}.")
+    except Exception as e:
+        print(f"Error migrating log file: {e}")
+
+def update_log(entry, log_file="prime_log.jsonl"):
+    """
+    Appends the new entry to the JSON Lines log file (O(1), no rewrite of the history)
+    and keeps the aggregate index in sync.
+    """
+    # Validated against the log before the append, so only this entry has to be folded in
+    records = _load_index(log_file)
+    try:
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
     except Exception as e:
         print(f"Error updating log file: {e}")
-    return logs
+        return
+    _aggregate_entry(records.setdefault(_entry_key(entry), {}), entry)
+    _write_index(log_file, records)
+
+def _index_file(log_file):
+    """Path of the aggregate index kept next to a JSON Lines log."""
+    return os.path.splitext(log_file)[0] + "_index.json"
+
+# Entries logged before the search method was recorded counted every random draw as an
+# attempt (including the ones the wheel rejected), so they are kept apart from every method
+LEGACY_METHOD = "legacy"
+
+# Bumped whenever the index keys change, so an index written with other keys is rebuilt
+INDEX_VERSION = 3
+
+def _index_key(digits, method, rigorous=False):
+    """Index key of one (digit count, search method, test) triple (JSON keys are strings)."""
+    return f"{digits}:{method}:{'rigorous' if rigorous else 'bpsw'}"
 
-def get_best_historical_metrics(digits, log_file="prime_log.json"):
+def _entry_key(e):
+    """Index key of a log entry."""
+    return _index_key(e.get("digits"), e.get("method", LEGACY_METHOD),
+                      e.get("rigorous", False))
+
+def _aggregate_entry(record, e):
+    """
+    Folds one log entry into an index record holding the extrema of its
+    (digits, method, test) key, the prime of the fastest run and the speed sum and count.
     """
-    Reads the log file and filters entries with the same digit count.
+    attempts = e.get("attempts")
+    if attempts is not None and attempts < record.get("attempts", float('inf')):
+        record["attempts"] = attempts
+    elapsed = e.get("elapsed")
+    if elapsed is not None and elapsed < record.get("elapsed", float('inf')):
+        record["elapsed"] = elapsed
+        record["prime_scientific"] = e.get("prime_scientific", "N/A")
+    speed = e.get("speed")
+    if speed is not None:
+        record["speed_sum"] = record.get("speed_sum", 0.0) + speed
+        record["speed_count"] = record.get("speed_count", 0) + 1
+        if speed > record.get("speed", float('-inf')):
+            record["speed"] = speed
+    cpu = e.get("cpu")
+    if cpu is not None and cpu < record.get("cpu", float('inf')):
+        record["cpu"] = cpu
+
+def _build_index(logs):
+    """Aggregates parsed log entries into index records, in a single pass."""
+    records = {}
+    for e in logs:
+        _aggregate_entry(records.setdefault(_entry_key(e), {}), e)
+    return records
+
+def _log_size(log_file):
+    """Size of the log in bytes, or 0 if it does not exist."""
+    try:
+        return os.stat(log_file).st_size
+    except OSError:
+        return 0
+
+# In-memory copy of the last index read or written, so the runs of a --repeat series
+# neither re-read nor re-parse it; valid while the log keeps the size it covers
+_INDEX_CACHE = {'path': None, 'log_size': None, 'records': None}
+
+def _write_index(log_file, records):
+    """Writes the index atomically (temporary file + rename) and caches it."""
+    index_file = _index_file(log_file)
+    log_size = _log_size(log_file)
+    try:
+        with open(index_file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "log_size": log_size, "records": records}, f)
+        os.replace(index_file + ".tmp", index_file)
+    except Exception as e:
+        print(f"Error writing log index: {e}")
+        return
+    _INDEX_CACHE.update(path=log_file, log_size=log_size, records=records)
+
+def _load_index(log_file="prime_log.jsonl"):
+    """
+    Returns the index records for the log. The index stores the size of the log it
+    covers and its INDEX_VERSION; if it is missing or either does not match (e.g. the
+    log was edited, migrated or written by an older version), it is rebuilt from the
+    full log once.
+    """
+    log_size = _log_size(log_file)
+    if _INDEX_CACHE['path'] == log_file and _INDEX_CACHE['log_size'] == log_size:
+        return _INDEX_CACHE['records']
+    try:
+        with open(_index_file(log_file), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION and index.get("log_size") == log_size:
+            _INDEX_CACHE.update(path=log_file, log_size=log_size, records=index["records"])
+            return index["records"]
+    except (OSError, ValueError, AttributeError):
+        pass
+    records = _build_index(_load_logs(log_file))
+    if os.path.exists(log_file):
+        _write_index(log_file, records)
+    return records
+
+def get_best_historical_metrics(digits, log_file="prime_log.jsonl", method="wheel",
+                                rigorous=False):
+    """
+    Looks up the entries with the same digit count, search method and primality
+    test (--rigorous or not) in the log index (entries without a method are only
+    compared with each other, under LEGACY_METHOD, since they counted attempts
+    differently).
     Returns a dictionary with the best historical values for:
       - Attempts (minimum)
       - Time (minimum)
       - Numbers/Sec (maximum)
-      - CPU Usage (minimum)
-      - Prime (in scientific notation) from the test with the lowest time.
+      - CPU Usage (minimum, if logged)
+      - Prime (in scientific notation) from the test with the lowest time
+    plus the average speed ("avg_speed").
     Returns None if no records exist.
     """
-    if not os.path.exists(log_file):
-        return None
-    try:
-        with open(log_file, "r", encoding="utf-8") as f:
-            logs = json.load(f)
-    except Exception as e:
-        print(f"Error reading log file: {e}")
-        return None
-    same_digit_entries = [e for e in logs if e.get("digits") == digits]
-    if not same_digit_entries:
-        return None
     try:
-        best = {}
-        best["attempts"] = min(e["attempts"] for e in same_digit_entries if "attempts" in e)
-        best["elapsed"] = min(e["elapsed"] for e in same_digit_entries if "elapsed" in e)
-        best["speed"] = max(e["speed"] for e in same_digit_entries if "speed" in e)
-        best_entry = min(same_digit_entries, key=lambda e: e.get("elapsed", float('inf')))
-        best["prime_scientific"] = best_entry.get("prime_scientific", "N/A")
+        records = _load_index(log_file)
+        record = records.get(_index_key(digits, method, rigorous))
+        if not record or not all(k in record for k in ("attempts", "elapsed", "speed")):
+            return None
+        best = {k: record[k] for k in ("attempts", "elapsed", "speed", "prime_scientific")}
+        best["avg_speed"] = record["speed_sum"] / record["speed_count"]
+        if "cpu" in record:
+            best["cpu"] = record["cpu"]
     except Exception as e:
         print(f"Error processing historical metrics: {e}")
         return None
     return best
+# ---------------------------------------------------------
 
-def get_previous_best_ratio(digits, log_file="prime_log.json"):
+# ---------------- Primality Tests ----------------
+def _gmp_has_bpsw():
     """
-    Computes the previous best ratio based on the historical best speed.
-    The ratio is defined as (1 / speed) * 1000 (ms/attempt).
-    Returns None if no valid speed is found.
+    True if gmpy2 is built on GMP >= 6.2, whose mpz_probab_prime_p runs trial division
+    and a Baillie-PSW test, followed by reps - 24 Miller-Rabin rounds (older versions
+    and MPIR only run reps Miller-Rabin rounds).
     """
-    if not os.path.exists(log_file):
-        return None
+    name, _, version = gmpy2.mp_version().partition(" ")
     try:
-        with open(log_file, "r", encoding="utf-8") as f:
-            logs = json.load(f)
-        speeds = [entry["speed"] for entry in logs 
-                  if entry.get("digits") == digits and entry.get("speed", 0) > 0]
-        if speeds:
-            best_speed = max(speeds)  # Assuming "best" speed means the highest speed.
-            return (1 / best_speed) * 1000
-        else:
-            return None
-    except Exception as e:
-        return None
+        return name == "GMP" and tuple(int(x) for x in version.split(".")[:2]) >= (6, 2)
+    except ValueError:
+        return False
+
+if _gmp_has_bpsw():
+    # GMP's own BPSW is faster than gmpy2.is_bpsw_prp (about 35 vs 52 ms at 1000 digits)
+    def bpsw_test(n):
+        """Baillie-PSW probable-prime test (no known counterexample)."""
+        return gmpy2.is_prime(n, 1)
+
+    def _bpsw_mr_test(n):
+        """Baillie-PSW plus two Miller-Rabin rounds with random bases."""
+        return gmpy2.is_prime(n, 26)
+else:
+    def bpsw_test(n):
+        """Baillie-PSW probable-prime test (no known counterexample)."""
+        return gmpy2.is_bpsw_prp(n)
+
+    def _bpsw_mr_test(n):
+        """Baillie-PSW plus two Miller-Rabin rounds, to bases 3 and 5."""
+        return gmpy2.is_bpsw_prp(n) and (n <= 5 or (gmpy2.is_strong_prp(n, 3)
+                                                     and gmpy2.is_strong_prp(n, 5)))
+
+# BPSW has no pseudoprime below 2**64 (checked exhaustively), and Miller-Rabin to the
+# prime bases up to 41 has none below DET_MR_LIMIT (Sorenson and Webster, 2015)
+BPSW_DETERMINISTIC_LIMIT = 2 ** 64
+DET_MR_LIMIT = 3_317_044_064_679_887_385_961_981
+DET_MR_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+_DET_MR_BASES_PRODUCT = math.prod(DET_MR_BASES)
+
+def deterministic_mr_test(n):
+    """
+    Miller-Rabin to the bases DET_MR_BASES: a proof of primality for n < DET_MR_LIMIT.
+    """
+    if n <= DET_MR_BASES[-1]:
+        return n in DET_MR_BASES
+    if gmpy2.gcd(n, _DET_MR_BASES_PRODUCT) != 1:
+        return False
+    return all(gmpy2.is_strong_prp(n, a) for a in DET_MR_BASES)
+
+def rigorous_test(n):
+    """
+    Primality test for --rigorous and for confirming the winner: deterministic up to
+    24 digits (BPSW alone below 2**64, faster here than any fixed Miller-Rabin base
+    set; deterministic_mr_test up to DET_MR_LIMIT), BPSW plus two Miller-Rabin
+    rounds above.
+    """
+    if n < BPSW_DETERMINISTIC_LIMIT:
+        return bpsw_test(n)
+    if n < DET_MR_LIMIT:
+        return deterministic_mr_test(n)
+    return _bpsw_mr_test(n)
 # ---------------------------------------------------------
 
 # ---------------- Multiprocessing Worker ----------------
-def worker(lower, upper, global_attempts, found_event, result_dict, batch_size):
+def cpu_sampler(samples, stop):
     """
-    Worker process: generates random candidates and updates the global counter in batches.
-    Uses a local counter to reduce lock contention.
+    Background thread of main(): appends one system-wide CPU usage sample per
+    CPU_SAMPLE_INTERVAL to 'samples' until 'stop' is set, so the progress loop
+    never reads /proc/stat itself.
+    """
+    while not stop.is_set():
+        samples.append(psutil.cpu_percent(interval=CPU_SAMPLE_INTERVAL))
+
+def pin_to_cpu(pid, cpu):
+    """Pins process 'pid' to logical CPU 'cpu'; failures leave it unpinned."""
+    try:
+        psutil.Process(pid).cpu_affinity([cpu])
+    except (AttributeError, psutil.Error, OSError):
+        pass
+
+def worker_range(index, count):
+    """
+    Splits the search range in _BOUNDS into 'count' disjoint sub-ranges and returns
+    sub-range 'index' as (lower, upper); the last one also takes the remainder.
+    Falls back to the whole range if it is too small to be split.
+    """
+    lower, upper = _BOUNDS
+    span = (upper - lower) // count
+    if span == 0:
+        return lower, upper
+    sub_lower = lower + index * span
+    return sub_lower, upper if index == count - 1 else sub_lower + span
+
+def publish_result(result, prime):
+    """
+    Writes 'prime' into the shared result buffer as raw gmpy2.to_binary bytes (no
+    pickling, no queue). 'result' is the (lock, length, buffer) triple built by main();
+    only the first worker to get here publishes, a simultaneous second find is dropped.
+    """
+    lock, length, buffer = result
+    data = gmpy2.to_binary(prime)
+    with lock:
+        if length.value == 0:
+            buffer[:len(data)] = data
+            length.value = len(data)
+
+def worker(counters, index, stop_flag, found_event, result, rigorous=False):
+    """
+    Worker process: scans its own sub-range (see worker_range) upwards from one
+    random starting point in segments, wrapping back to the start of the sub-range at
+    its end, so no two workers ever test the same number. Each segment is sieved
+    with the mod-30 wheel and the primes from sieve_parameters() first, so only
+    numbers without a small factor reach the probable-prime test. The offsets of the
+    sieving primes are carried from one segment to the next, so the bignum is only
+    divided by them at the start and after a wrap-around.
+    Attempts count the wheel candidates scanned, as they are tested; they are counted
+    locally and flushed every ATTEMPT_FLUSH_INTERVAL * 10 / digits candidates into
+    counters[index * COUNTER_STRIDE], a slot on its own cache line that only this
+    worker writes, so no lock is needed.
+    The loop polls the shared stop_flag (a plain memory read) rather than found_event
+    (a semaphore call); the finder sets both, the event only wakes up main().
+    The prime found is sent back through the shared buffer (see publish_result).
+    Candidates are tested with BPSW only (bpsw_test: one base-2 strong test plus
+    one strong Lucas test, no known counterexample). With 'rigorous', two more
+    Miller-Rabin rounds are added (rigorous_test).
     """
-    wheel_offsets = (1, 7, 11, 13, 17, 19, 23, 29)
     local_count = 0
+    # Bound once to a local name for the loop
+    is_prime = rigorous_test if rigorous else bpsw_test
     try:
-        while not found_event.is_set():
-            candidate = random.randrange(lower, upper)
-            local_count += 1
-            if local_count >= batch_size:
-                with global_attempts.get_lock():
-                    global_attempts.value += local_count
-                local_count = 0
-            if candidate % 30 not in wheel_offsets:
-                continue
-            if is_probable_prime(candidate):
-                with global_attempts.get_lock():
-                    global_attempts.value += local_count
-                    result_dict['attempts'] = global_attempts.value
-                result_dict['prime'] = candidate
+        slot = index * COUNTER_STRIDE
+        lower, upper = worker_range(index, len(counters) // COUNTER_STRIDE)
+        digits = gmpy2.num_digits(_BOUNDS[0], 10)
+        segment_length, primes = sieve_parameters(digits)
+        flush_interval = max(1, ATTEMPT_FLUSH_INTERVAL * 10 // digits)
+        wheel_mask = WHEEL_MASK * (segment_length // 30)
+        # Seeded from the OS so forked workers never share a random stream
+        state = gmpy2.random_state(int.from_bytes(os.urandom(8), "little"))
+        start = gmpy2.mpz_random(state, upper - lower) + lower
+        wrap_base = lower - gmpy2.f_mod(lower, 30)
+        base = start - gmpy2.f_mod(start, 30)
+        pos = int(start - base)
+        offsets = first_multiple_offsets(base, primes)
+        while not stop_flag.value:
+            segment, next_offsets = sieve_next_segment(base, segment_length, primes, offsets)
+            end = segment_length if base + segment_length <= upper else int(upper - base)
+            # Candidates are counted as they are tested, so the progress display keeps
+            # moving even when one segment holds hundreds of BPSW tests
+            last = pos
+            i = segment.find(1, pos, end)
+            while i != -1 and not stop_flag.value:
+                found = is_prime(base + i)
+                local_count += wheel_mask.count(1, last, i + 1)
+                last = i + 1
+                if found:
+                    counters[slot] += local_count
+                    local_count = 0
+                    publish_result(result, base + i)
+                    stop_flag.value = 1
+                    found_event.set()
+                    break
+                if local_count >= flush_interval:
+                    counters[slot] += local_count
+                    local_count = 0
+                i = segment.find(1, i + 1, end)
+            else:
+                local_count += wheel_mask.count(1, last, end if i == -1 else i)
+                if local_count >= flush_interval:
+                    counters[slot] += local_count
+                    local_count = 0
+                base += segment_length
+                pos = 0
+                if base >= upper:
+                    base = wrap_base
+                    pos = int(lower - wrap_base)
+                    offsets = first_multiple_offsets(base, primes)
+                else:
+                    offsets = next_offsets
+        # Flush whatever is left so the final attempt count is exact
+        if local_count:
+            counters[slot] += local_count
+    except Exception as e:
+        print(f"Error in worker process: {e}")
+
+def next_prime_worker(counters, index, stop_flag, found_event, result, rigorous=False):
+    """
+    Worker process for the "next_prime" method: draws a random start in its own
+    sub-range (see worker_range) and lets gmpy2.next_prime (GMP's trial division +
+    BPSW) find the following prime in C. Draws again if the result overshoots the
+    upper bound of the whole search range.
+    Since GMP does not report how many candidates it tested, attempts are estimated
+    as the number of mod-30 wheel candidates between the start and the prime found,
+    and added to counters[index * COUNTER_STRIDE].
+    With 'rigorous', the prime is confirmed with rigorous_test.
+    """
+    try:
+        slot = index * COUNTER_STRIDE
+        lower, upper = worker_range(index, len(counters) // COUNTER_STRIDE)
+        # Seeded from the OS so forked workers never share a random stream
+        state = gmpy2.random_state(int.from_bytes(os.urandom(8), "little"))
+        while not stop_flag.value:
+            start = gmpy2.mpz_random(state, upper - lower) + lower
+            candidate = gmpy2.next_prime(start)
+            counters[slot] += int((candidate - start) * 8 // 30) + 1
+            if candidate < _BOUNDS[1] and (not rigorous or rigorous_test(candidate)):
+                publish_result(result, candidate)
+                stop_flag.value = 1
                 found_event.set()
                 break
     except Exception as e:
         print(f"Error in worker process: {e}")
+
+# Search methods selectable from the command line: worker function and description
+SEARCH_METHODS = {
+    "wheel": (worker, "Segmented sieve (mod-30 wheel and small primes) from a random start\nand gmpy2 BPSW probable-prime test."),
+    "next_prime": (next_prime_worker, "gmpy2.next_prime from a random start\n(GMP trial division and BPSW test)."),
+}
 # ---------------------------------------------------------
 
 # ---------------- Main Function ----------------
-def main(digits_param=None, repeat_mode=False, repeat_count=10):
+def main(digits_param=None, repeat_mode=False, repeat_count=10, method="wheel", procs=None,
+         rigorous=False):
     """
     Executes the test for the given digit count and displays the results.
     Shows:
@@ -271,6 +783,11 @@ def main(digits_param=None, repeat_mode=False, repeat_count=10):
     If not, and if repeat_mode is True, the test is repeated for the specified number of iterations.
     For the final summary, if elapsed time < 1 sec, time is shown in milliseconds;
     otherwise, in MM:SS:CC.
+    'method' selects the search method (a key of SEARCH_METHODS); history is only
+    compared against runs of the same method.
+    'procs' overrides the number of worker processes (default: one per physical core
+    this process may run on).
+    'rigorous' adds two Miller-Rabin rounds to the BPSW-only test.
     """
     # Get digit count from parameter or input
     if digits_param is None:
@@ -289,99 +806,140 @@ def main(digits_param=None, repeat_mode=False, repeat_count=10):
     print("\n")  # Blank line
 
     # Display algorithm (two lines)
-    print("Algorithm used: Random candidate generation with wheel filter optimization")
-    print("and gmpy2 probabilistic prime test.\n")
+    target, description = SEARCH_METHODS[method]
+    print(f"Algorithm used: {description}")
+    if rigorous:
+        print("Rigorous mode: BPSW plus two Miller-Rabin rounds.")
+    print()
 
+    global _BOUNDS
     try:
-        lower = 10**(digits - 1)
-        upper = 10**digits
+        # One GMP power (mpz_pow_ui, memoized); the lower bound is derived by an exact division
+        upper = pow10(digits)
+        _BOUNDS = (upper // 10, upper)
     except Exception as e:
         print(f"Error computing bounds for digits: {e}")
         return
 
-    # Historical average speed (not used in display)
-    historical_avg_speed = None
-    log_file = "prime_log.json"
-    if os.path.exists(log_file):
-        try:
-            with open(log_file, "r", encoding="utf-8") as f:
-                logs = json.load(f)
-            relevant_entries = [entry for entry in logs if entry.get("digits") == digits and "speed" in entry]
-            if relevant_entries:
-                historical_avg_speed = sum(entry["speed"] for entry in relevant_entries) / len(relevant_entries)
-        except Exception as e:
-            historical_avg_speed = None
+    # History comes from the small aggregate index, not from a scan of the full log
+    log_file = "prime_log.jsonl"
+    _migrate_json_to_jsonl("prime_log.json", log_file)
 
-    # Historical best metrics (if available)
-    historical_best = get_best_historical_metrics(digits)
+    # Historical best metrics (if available), with the average speed (not used in display)
+    historical_best = get_best_historical_metrics(digits, log_file, method, rigorous)
+    historical_avg_speed = historical_best["avg_speed"] if historical_best else None
 
     # Use physical cores to avoid hyperthreading
-    physical_cores = psutil.cpu_count(logical=False) or psutil.cpu_count(logical=True)
-    num_processes = physical_cores
+    # psutil's core count ignores CPU affinity (e.g. a cpuset-restricted container), so
+    # prefer the cores this process may actually run on
+    num_processes = procs or (len(_CORE_CPUS) if _CORE_CPUS else _PHYSICAL_CORES)
+    # Pin one worker per physical core only when there are enough cores for all of them;
+    # otherwise leave placement to the scheduler
+    core_cpus = _CORE_CPUS if _CORE_CPUS and num_processes <= len(_CORE_CPUS) else None
 
-    # Define batch size = max(1, 10% of digit count)
-    batch_size = max(1, int(0.1 * digits))
-
-    manager = multiprocessing.Manager()
-    result_dict = manager.dict()
+    # The winning worker writes its prime as raw bytes into a preallocated shared buffer
+    # (to_binary needs about 0.42 bytes per digit); the lock only arbitrates between two
+    # simultaneous finds, main reads the length without it
+    result = (multiprocessing.Lock(), multiprocessing.RawValue('q', 0),
+              multiprocessing.RawArray('B', digits // 2 + 16))
+    # Workers poll stop_flag; found_event only wakes up the progress loop below
+    stop_flag = multiprocessing.RawValue('b', 0)
     found_event = multiprocessing.Event()
-    global_attempts = multiprocessing.Value('l', 0)
+    # One lock-free attempt counter per worker (each slot has a single writer and its own
+    # cache line; the padding entries stay 0), summed for display
+    counters = multiprocessing.Array('Q', num_processes * COUNTER_STRIDE, lock=False)
     
-    # Start worker processes, passing the batch_size to each
+    warm_up_sieve()
+
+    # Start worker processes
     workers = []
     for _ in range(num_processes):
         try:
-            p = multiprocessing.Process(target=worker,
-                                        args=(lower, upper, global_attempts, found_event, result_dict, batch_size))
+            p = multiprocessing.Process(target=target,
+                                        args=(counters, len(workers), stop_flag, found_event, result, rigorous))
             p.start()
+            if core_cpus:
+                pin_to_cpu(p.pid, core_cpus[len(workers)])
             workers.append(p)
         except Exception as e:
             print(f"Error starting a worker process: {e}")
 
     start_time = time.time()
+    # Prime psutil's CPU counters for runs shorter than one sample, then sample out-of-band
+    cpu_percent = psutil.cpu_percent(interval=None)
+    cpu_samples = deque(maxlen=CPU_SAMPLE_COUNT)
+    sampler_stop = threading.Event()
+    threading.Thread(target=cpu_sampler, args=(cpu_samples, sampler_stop), daemon=True).start()
     try:
-        # Live progress update (without ETA); double the sleep interval for updates (1.0 sec)
-        with Live("", refresh_per_second=4, console=console) as live:
-            while not found_event.is_set():
-                time.sleep(1.0)
-                elapsed = time.time() - start_time
-                with global_attempts.get_lock():
-                    attempts_val = global_attempts.value
-                speed = attempts_val / elapsed if elapsed > 0 else 0
-                cpu_percent = psutil.cpu_percent(interval=0.0)
-                progress_line = (f"Digit Count: {digits} | Attempts: {attempts_val} | Time: {format_time(elapsed)} | "
-                                 f"Numbers/Sec: {speed:.2f} | CPU Usage: {cpu_percent:.2f}%")
-                live.update(Text(progress_line, style="bold"))
+        # Progress update (without ETA), redrawn in place with a carriage return.
+        # Waiting on the event instead of sleeping ends the loop as soon as a prime is found.
+        while not found_event.wait(PROGRESS_INTERVAL):
+            now = time.time()
+            elapsed = now - start_time
+            attempts_val = sum(counters)
+            speed = attempts_val / elapsed if elapsed > 0 else 0
+            # The sampler thread appends concurrently: average a snapshot, not the live deque
+            samples = list(cpu_samples)
+            if samples:
+                cpu_percent = statistics.mean(samples)
+            progress_line = (f"Digit Count: {digits} | Attempts: {attempts_val} | Time: {format_time(elapsed)} | "
+                             f"Numbers/Sec: {speed:.2f} | CPU Usage: {cpu_percent:.2f}%")
+            # \033[K clears what is left of a longer previous line (e.g. "100.00%" -> "99.50%")
+            sys.stdout.write(f"\r{progress_line}\033[K")
+            sys.stdout.flush()
+        sys.stdout.write("\n")
     except KeyboardInterrupt:
+        stop_flag.value = 1
         found_event.set()
         print("\nInterrupted by user.")
         return
     except Exception as e:
         print(f"\nError during progress update: {e}")
+        stop_flag.value = 1
         found_event.set()
         return
+    finally:
+        sampler_stop.set()
+    # Mean of the recent samples (a snapshot: a sample still in flight may land after the stop);
+    # a run shorter than one sample uses the usage since priming
+    samples = list(cpu_samples)
+    cpu_percent = statistics.mean(samples) if samples else psutil.cpu_percent(interval=None)
 
+    # A next_prime worker cannot observe stop_flag until its GMP call returns,
+    # so the remaining ones are stopped instead of waited for.
+    if method == "next_prime":
+        for p in workers:
+            p.terminate()
     for p in workers:
         p.join()
-    
+    _, result_len, result_buf = result
+    prime = gmpy2.from_binary(bytes(result_buf[:result_len.value])) if result_len.value else None
+
     total_elapsed = time.time() - start_time
-    with global_attempts.get_lock():
-        final_attempts = global_attempts.value
+    final_attempts = sum(counters)
     final_speed = final_attempts / total_elapsed if total_elapsed > 0 else 0
-    prime = result_dict.get('prime', None)
     if prime is None:
         print("No prime found.")
         return
+    # The search itself only runs BPSW; confirm the winner with two extra Miller-Rabin
+    # rounds once, outside the timed part
+    if not rigorous and not rigorous_test(prime):
+        print("Warning: the number found failed the Miller-Rabin confirmation.")
+    # Convert the prime to decimal once; the log and the display share the string
+    prime_str = gmpy2.digits(prime, 10)
+    prime_scientific = format_scientific_from_str(prime_str, precision=3)
 
     entry = {
         "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
         "digits": digits,
+        "method": method,
+        "rigorous": rigorous,
         "attempts": final_attempts,
         "elapsed": total_elapsed,
         "speed": final_speed,
         "cpu": cpu_percent,
-        "prime": str(prime),
-        "prime_scientific": format_scientific(prime, precision=3)
+        "prime": prime_str,
+        "prime_scientific": prime_scientific
     }
     
     try:
@@ -413,7 +971,7 @@ def main(digits_param=None, repeat_mode=False, repeat_count=10):
     print("{:<15} {:<20} {:<20} {:<15}".format("CPU Usage", f"{cpu_percent:.2f}%",
           f"{historical_best['cpu']:.2f}%" if historical_best and "cpu" in historical_best else f"{cpu_percent:.2f}%",
           format_variation(compute_variation(cpu_percent, historical_best["cpu"]) if historical_best and "cpu" in historical_best else 0)))
-    print("{:<15} {:<20}".format("Prime Found", f"\033[1m{format_scientific(prime, precision=3)}\033[0m"))
+    print("{:<15} {:<20}".format("Prime Found", f"\033[1m{prime_scientific}\033[0m"))
     
     print(f"\nPerformance Ratio: {current_ratio_ms:.3f} ms/attempt")
     print(f"Previous best ratio: {previous_best_ratio_ms:.3f} ms/attempt")
@@ -422,15 +980,31 @@ def main(digits_param=None, repeat_mode=False, repeat_count=10):
     if current_ratio_ms < previous_best_ratio_ms:
         play_beep()
         print("\nNew record achieved!")
-        print("\nTo see full number type: jq '.[-1].prime' prime_log.json")
+        print("\nTo see full number type: tail -n 1 prime_log.jsonl | jq -r .prime")
         sys.exit(0)
     return
 
+def positive_int(value):
+    """argparse type for options that need an integer of at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Prime search with specified digit count")
     parser.add_argument("digits", type=int, nargs="?", help="Digit count for the prime")
     parser.add_argument("-r", "--repeat", type=int, nargs="?", const=10,
                         help="Repeat tests for the specified number of iterations (default 10)")
+    parser.add_argument("-p", "--procs", type=positive_int,
+                        help="Number of worker processes (default: number of physical cores available)")
+    parser.add_argument("--rigorous", action="store_true",
+                        help="Test candidates with BPSW plus two Miller-Rabin rounds instead of BPSW only")
+    parser.add_argument("-m", "--method", choices=sorted(SEARCH_METHODS), default="wheel",
+                        help="Search method: segmented sieve (wheel) or gmpy2.next_prime (default wheel)")
     args = parser.parse_args()
     try:
         multiprocessing.set_start_method("fork")
@@ -441,11 +1015,13 @@ if __name__ == "__main__":
         if args.repeat is not None:
             for i in range(args.repeat):
                 print(f"\n--- Test iteration {i+1} of {args.repeat} ---\n")
-                main(digits_param=args.digits, repeat_mode=True)
+                main(digits_param=args.digits, repeat_mode=True, method=args.method, procs=args.procs,
+                     rigorous=args.rigorous)
                 print("\nRepeating test...\n")
                 time.sleep(2)  # doubled sleep interval between iterations
         else:
-            main(digits_param=args.digits, repeat_mode=False)
+            main(digits_param=args.digits, repeat_mode=False, method=args.method, procs=args.procs,
+                 rigorous=args.rigorous)
     except KeyboardInterrupt:
         print("\nProgram interrupted by user. Exiting gracefully.")
         sys.exit(0)